@@ -2,7 +2,7 @@
 
 from __future__ import annotations
 
-from datetime import UTC, datetime
+from datetime import UTC
 from pathlib import Path
 from typing import Optional
 
@@ -25,20 +25,25 @@ class OnlineTrackerBot(commands.Bot):
         super().__init__(command_prefix="!", intents=intents)
 
         self.config = config
-        self.database = Database(config.database_path)
+        self.database = Database(config.database_path, config.database_shards)
         self.tracker = PresenceTracker(self.database)
 
     async def setup_hook(self) -> None:
         await self.tracker.setup()
         await self._bootstrap_guilds()
 
+    async def close(self) -> None:
+        await super().close()
+        await self.database.close()
+
     async def _bootstrap_guilds(self) -> None:
         for guild in self.guilds:
             await self._bootstrap_guild(guild)
 
     async def _bootstrap_guild(self, guild: discord.Guild) -> None:
-        for member in guild.members:
-            await self.tracker.bootstrap_member(guild.id, member.id, member.status)
+        await self.tracker.bootstrap_members(
+            guild.id, ((member.id, member.status) for member in guild.members)
+        )
 
     async def on_guild_join(self, guild: discord.Guild) -> None:  # pragma: no cover - requires discord runtime
         await self._bootstrap_guild(guild)
@@ -76,8 +81,7 @@ class OnlineTrackerBot(commands.Bot):
                     return
                 statuses = (normalized,)
 
-            now = datetime.now(tz=UTC)
-            total = await self.tracker.get_total_duration(ctx.guild.id, target.id, statuses, now=now)
+            total = await self.tracker.get_total_duration(ctx.guild.id, target.id, statuses)
             formatted = self.tracker.format_timedelta(total)
             await ctx.send(f"{target.display_name} has been {status or 'online'} for {formatted}.")
 
@@ -90,7 +94,7 @@ class OnlineTrackerBot(commands.Bot):
             lines = []
             for (guild_id, user_id), session in active.items():
                 lines.append(
-                    f"Guild {guild_id} | User {user_id} -> {session.status} since {session.started_at.astimezone(UTC).isoformat()}"
+                    f"Guild {guild_id} | User {user_id} -> {session.status.name.lower()} since {session.started_at.astimezone(UTC).isoformat()}"
                 )
             await ctx.send("\n".join(lines))
 
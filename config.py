@@ -17,6 +17,7 @@ class BotConfig:
     token: str
     database_path: Path
     timezone: str = "UTC"
+    database_shards: int = 1
 
     @classmethod
     def load(cls, env_file: Optional[Path] = None) -> "BotConfig":
@@ -39,4 +40,10 @@ class BotConfig:
 
         database_path = Path(os.getenv("DATABASE_PATH", "online_tracker.db")).expanduser()
         timezone = os.getenv("TIMEZONE", "UTC")
-        return cls(token=token, database_path=database_path, timezone=timezone)
\ No newline at end of file
+        database_shards = int(os.getenv("DATABASE_SHARDS", "1"))
+        return cls(
+            token=token,
+            database_path=database_path,
+            timezone=timezone,
+            database_shards=database_shards,
+        )
\ No newline at end of file
@@ -3,161 +3,658 @@
 from __future__ import annotations
 
 import asyncio
+import logging
 import sqlite3
+from collections.abc import Callable, Iterator
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from dataclasses import dataclass
 from datetime import datetime
+from enum import IntEnum
 from pathlib import Path
-from typing import Optional
+from typing import Any, Optional, TypeVar, Union
+
+T = TypeVar("T")
+
+log = logging.getLogger(__name__)
+
+RowRef = Union[int, "asyncio.Future[int]"]
+
+# Bumped whenever _initialize_sync has to migrate existing data.
+_SCHEMA_VERSION = 2
+
+_CREATE_TABLE_SQL = """
+    CREATE TABLE IF NOT EXISTS presence_sessions (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        guild_id INTEGER NOT NULL,
+        user_id INTEGER NOT NULL,
+        status INTEGER NOT NULL CHECK (status IN (1, 2, 3)),
+        started_at INTEGER NOT NULL,
+        ended_at INTEGER
+    )
+"""
+
+# SQL text lives at module level so every call hands sqlite3 the same string
+# and hits its per-connection compiled statement cache instead of re-preparing.
+# The subquery is answered from idx_presence_sessions_open_partial, so the
+# cost scales with the number of open sessions rather than the table size.
+_CLOSE_OPEN_SESSIONS_SQL = """
+    UPDATE presence_sessions
+    SET ended_at = ?
+    WHERE id IN (SELECT id FROM presence_sessions WHERE ended_at IS NULL)
+"""
+
+_INSERT_SESSION_SQL = """
+    INSERT INTO presence_sessions (guild_id, user_id, status, started_at)
+    VALUES (?, ?, ?, ?)
+"""
+
+_COMPLETE_SESSION_SQL = """
+    UPDATE presence_sessions
+    SET ended_at = ?
+    WHERE id = ?
+"""
+
+_REOPEN_SESSION_SQL = """
+    UPDATE presence_sessions
+    SET ended_at = NULL
+    WHERE id = ?
+"""
+
+_DELETE_SESSION_SQL = """
+    DELETE FROM presence_sessions
+    WHERE id = ?
+"""
+
+
+def _fetch_sessions_sql(arity: int) -> str:
+    placeholders = ",".join("?" for _ in range(arity))
+    return f"""
+        SELECT id, guild_id, user_id, status, started_at, ended_at
+        FROM presence_sessions
+        WHERE guild_id = ? AND user_id = ? AND status IN ({placeholders})
+        ORDER BY started_at ASC
+    """
+
+
+def _total_duration_sql(arity: int) -> str:
+    placeholders = ",".join("?" for _ in range(arity))
+    return f"""
+        SELECT COALESCE(SUM(COALESCE(ended_at, ?) - started_at), 0)
+        FROM presence_sessions
+        WHERE guild_id = ? AND user_id = ? AND status IN ({placeholders})
+    """
+
+
+# Callers filter by one to three tracked statuses (online, idle, dnd).
+_FETCH_SESSIONS_SQL = {arity: _fetch_sessions_sql(arity) for arity in range(1, 4)}
+_TOTAL_DURATION_SQL = {arity: _total_duration_sql(arity) for arity in range(1, 4)}
+
+
+class PresenceStatus(IntEnum):
+    """Presence states as stored in the ``status`` column; only tracked ones are persisted."""
+
+    OTHER = 0
+    ONLINE = 1
+    IDLE = 2
+    DND = 3
+
+
+def to_unix(moment: datetime) -> int:
+    """Convert a timezone-aware datetime to the stored unix-seconds form."""
+
+    return int(moment.timestamp())
 
 
 @dataclass(slots=True)
 class PresenceSession:
-    """Represents a single tracked session."""
+    """Represents a single tracked session; timestamps are unix seconds."""
 
     row_id: int
     guild_id: int
     user_id: int
-    status: str
-    started_at: datetime
-    ended_at: Optional[datetime]
+    status: PresenceStatus
+    started_at: int
+    ended_at: Optional[int]
 
 
-class Database:
-    """SQLite-backed storage with asyncio-friendly helpers."""
+@dataclass(slots=True)
+class _PendingWrite:
+    """A queued statement waiting for the background writer."""
+
+    sql: str
+    params: tuple[Any, ...]
+    future: asyncio.Future[Any]
+    # Row id appended as the final parameter, possibly still owed by a queued INSERT.
+    row: Optional[RowRef] = None
+
+
+class _Shard:
+    """One SQLite file together with the worker thread and write queue that own it."""
+
+    WRITE_BATCH_SIZE = 64
+    WRITE_BATCH_DELAY = 0.05
 
     def __init__(self, database_path: Path) -> None:
         self._database_path = Path(database_path)
-        self._lock = asyncio.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._conn: Optional[sqlite3.Connection] = None
+        self._write_queue: Optional[asyncio.Queue[_PendingWrite]] = None
+        self._writer: Optional[asyncio.Task[None]] = None
 
     def _connect(self) -> sqlite3.Connection:
-        conn = sqlite3.connect(self._database_path)
-        conn.row_factory = sqlite3.Row
+        conn = sqlite3.connect(self._database_path, isolation_level=None)
+        # These pragmas are per-connection; WAL mode itself is set in _initialize_sync.
+        conn.execute("PRAGMA synchronous = NORMAL")
+        conn.execute("PRAGMA busy_timeout = 5000")
+        conn.execute("PRAGMA temp_store = MEMORY")
+        conn.execute("PRAGMA mmap_size = 268435456")
         return conn
 
+    def _connection(self) -> sqlite3.Connection:
+        """Return the shared connection, opening it on first use.
+
+        Opening lazily rather than in ``initialize`` keeps instances that never
+        touch storage (e.g. formatting-only callers) from creating the file.
+        """
+
+        if self._conn is None:
+            self._conn = self._connect()
+        return self._conn
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        conn = self._connection()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+            conn.execute("COMMIT")
+        except BaseException:
+            # SQLite may already have rolled back on its own (e.g. after SQLITE_FULL).
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+
+    async def _run(self, func: Callable[..., T], *args: Any) -> T:
+        # A single worker thread owns the connection, so calls are serialized
+        # without a lock and without hopping between pool threads.
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="sqlite-writer")
+        return await asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+
     async def initialize(self) -> None:
-        async with self._lock:
-            await asyncio.to_thread(self._initialize_sync)
+        await self._run(self._initialize_sync)
+
+    async def close(self) -> None:
+        """Flush queued writes and close the shared connection; it is reopened on next use."""
+
+        await self.flush()
+        if self._writer is not None:
+            self._writer.cancel()
+            try:
+                await self._writer
+            except asyncio.CancelledError:
+                pass
+            self._writer = None
+            self._write_queue = None
+        await self._run(self._close_sync)
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    def _close_sync(self) -> None:
+        if self._conn is None:
+            return
+        # Refresh planner statistics, then fold the WAL back into the main file
+        # so it does not linger between runs.
+        self._conn.execute("PRAGMA optimize")
+        self._conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        self._conn.close()
+        self._conn = None
 
     def _initialize_sync(self) -> None:
-        with self._connect() as conn:
+        # WAL is persisted in the database file, so enabling it once is enough.
+        self._connection().execute("PRAGMA journal_mode = WAL")
+        with self._transaction() as conn:
+            (version,) = conn.execute("PRAGMA user_version").fetchone()
+            if version < _SCHEMA_VERSION and self._table_exists(conn, "presence_sessions"):
+                self._migrate(conn, version)
+            conn.execute(_CREATE_TABLE_SQL)
+            # Superseded by the covering index below.
+            conn.execute("DROP INDEX IF EXISTS idx_presence_sessions_lookup")
             conn.execute(
                 """
-                CREATE TABLE IF NOT EXISTS presence_sessions (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    guild_id INTEGER NOT NULL,
-                    user_id INTEGER NOT NULL,
-                    status TEXT NOT NULL,
-                    started_at TEXT NOT NULL,
-                    ended_at TEXT
-                )
+                CREATE INDEX IF NOT EXISTS idx_presence_sessions_cover
+                ON presence_sessions (guild_id, user_id, status, started_at, ended_at)
                 """
             )
             conn.execute(
                 """
-                CREATE INDEX IF NOT EXISTS idx_presence_sessions_lookup
-                ON presence_sessions (guild_id, user_id, status)
+                CREATE INDEX IF NOT EXISTS idx_presence_sessions_open
+                ON presence_sessions (guild_id, user_id, ended_at)
                 """
             )
             conn.execute(
                 """
-                CREATE INDEX IF NOT EXISTS idx_presence_sessions_open
-                ON presence_sessions (guild_id, user_id, ended_at)
+                CREATE INDEX IF NOT EXISTS idx_presence_sessions_open_partial
+                ON presence_sessions (id) WHERE ended_at IS NULL
                 """
             )
-            conn.commit()
+            conn.execute(f"PRAGMA user_version = {_SCHEMA_VERSION}")
+
+    @staticmethod
+    def _table_exists(conn: sqlite3.Connection, name: str) -> bool:
+        row = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (name,)
+        ).fetchone()
+        return row is not None
+
+    @staticmethod
+    def _migrate(conn: sqlite3.Connection, version: int) -> None:
+        """Rebuild a table written by an older schema version.
+
+        Version 0 stored ISO-8601 TEXT timestamps; versions before 2 stored the
+        status as its lowercase name instead of a ``PresenceStatus`` code.
+        """
+
+        if version < 1:
+            started_at = "CAST(strftime('%s', started_at) AS INTEGER)"
+            ended_at = "CAST(strftime('%s', ended_at) AS INTEGER)"
+        else:
+            started_at, ended_at = "started_at", "ended_at"
+        conn.execute("ALTER TABLE presence_sessions RENAME TO presence_sessions_old")
+        conn.execute(_CREATE_TABLE_SQL)
+        conn.execute(
+            f"""
+            INSERT INTO presence_sessions (id, guild_id, user_id, status, started_at, ended_at)
+            SELECT
+                id,
+                guild_id,
+                user_id,
+                CASE status
+                    WHEN 'online' THEN {PresenceStatus.ONLINE.value}
+                    WHEN 'idle' THEN {PresenceStatus.IDLE.value}
+                    ELSE {PresenceStatus.DND.value}
+                END,
+                {started_at},
+                {ended_at}
+            FROM presence_sessions_old
+            WHERE status IN ('online', 'idle', 'dnd')
+            """
+        )
+        # Dropping the old table also drops its indexes, which are recreated afterwards.
+        conn.execute("DROP TABLE presence_sessions_old")
+
+    async def checkpoint(self) -> None:
+        """Copy the WAL into the database file and truncate it."""
+
+        await self._run(self._checkpoint_sync)
+
+    def _checkpoint_sync(self) -> None:
+        if self._conn is not None:
+            self._conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
 
     async def close_open_sessions(self, closed_at: datetime) -> None:
-        await asyncio.to_thread(self._close_open_sessions_sync, closed_at)
+        await self._run(self._close_open_sessions_sync, closed_at)
 
     def _close_open_sessions_sync(self, closed_at: datetime) -> None:
-        with self._connect() as conn:
-            conn.execute(
-                """
-                UPDATE presence_sessions
-                SET ended_at = ?
-                WHERE ended_at IS NULL
-                """,
-                (closed_at.isoformat(),),
-            )
-            conn.commit()
+        with self._transaction() as conn:
+            conn.execute(_CLOSE_OPEN_SESSIONS_SQL, (to_unix(closed_at),))
 
-    async def insert_session(
+    def submit_insert(
         self,
         guild_id: int,
         user_id: int,
-        status: str,
+        status: PresenceStatus,
         started_at: datetime,
-    ) -> int:
-        return await asyncio.to_thread(
-            self._insert_session_sync, guild_id, user_id, status, started_at
-        )
+    ) -> asyncio.Future[int]:
+        """Queue a session INSERT; the future resolves to the row id once committed."""
 
-    def _insert_session_sync(
-        self, guild_id: int, user_id: int, status: str, started_at: datetime
-    ) -> int:
-        with self._connect() as conn:
-            cursor = conn.execute(
-                """
-                INSERT INTO presence_sessions (guild_id, user_id, status, started_at)
-                VALUES (?, ?, ?, ?)
-                """,
-                (guild_id, user_id, status, started_at.isoformat()),
-            )
-            conn.commit()
-            return int(cursor.lastrowid)
+        return self._submit(_INSERT_SESSION_SQL, (guild_id, user_id, status, to_unix(started_at)))
 
-    async def complete_session(self, row_id: int, ended_at: datetime) -> None:
-        await asyncio.to_thread(self._complete_session_sync, row_id, ended_at)
+    def submit_complete(self, row: RowRef, ended_at: datetime) -> asyncio.Future[None]:
+        """Queue closing a session, by row id or by the future of a queued INSERT."""
 
-    def _complete_session_sync(self, row_id: int, ended_at: datetime) -> None:
-        with self._connect() as conn:
-            conn.execute(
-                """
-                UPDATE presence_sessions
-                SET ended_at = ?
-                WHERE id = ?
-                """,
-                (ended_at.isoformat(), row_id),
-            )
-            conn.commit()
+        return self._submit(_COMPLETE_SESSION_SQL, (to_unix(ended_at),), row)
+
+    def submit_reopen(self, row: RowRef) -> asyncio.Future[None]:
+        """Queue clearing ``ended_at`` so a recently closed session continues."""
+
+        return self._submit(_REOPEN_SESSION_SQL, (), row)
+
+    def submit_delete(self, row: RowRef) -> asyncio.Future[None]:
+        """Queue removing a session row, e.g. a status blip merged into its neighbours."""
+
+        return self._submit(_DELETE_SESSION_SQL, (), row)
+
+    async def insert_sessions_bulk(
+        self, rows: list[tuple[int, int, PresenceStatus, datetime]]
+    ) -> list[int]:
+        """Insert ``(guild_id, user_id, status, started_at)`` rows in one transaction."""
+
+        if not rows:
+            return []
+        return await self._run(self._insert_sessions_bulk_sync, rows)
+
+    def _insert_sessions_bulk_sync(
+        self, rows: list[tuple[int, int, PresenceStatus, datetime]]
+    ) -> list[int]:
+        row_ids: list[int] = []
+        with self._transaction() as conn:
+            # executemany() cannot report per-row ids, so run the cached INSERT
+            # per row; the single COMMIT is what makes this cheap.
+            for guild_id, user_id, status, started_at in rows:
+                cursor = conn.execute(
+                    _INSERT_SESSION_SQL, (guild_id, user_id, status, to_unix(started_at))
+                )
+                row_ids.append(int(cursor.lastrowid))
+        return row_ids
+
+    async def flush(self) -> None:
+        """Wait until every queued write has been committed (or has failed)."""
+
+        if self._write_queue is not None:
+            await self._write_queue.join()
+
+    def _submit(
+        self, sql: str, params: tuple[Any, ...], row: Optional[RowRef] = None
+    ) -> asyncio.Future[Any]:
+        loop = asyncio.get_running_loop()
+        if self._write_queue is None:
+            self._write_queue = asyncio.Queue()
+        if self._writer is None or self._writer.done():
+            self._writer = loop.create_task(self._write_loop(self._write_queue))
+        future: asyncio.Future[Any] = loop.create_future()
+        self._write_queue.put_nowait(_PendingWrite(sql, params, future, row))
+        return future
+
+    async def _write_loop(self, queue: asyncio.Queue[_PendingWrite]) -> None:
+        """Drain the queue, committing up to WRITE_BATCH_SIZE writes per transaction."""
+
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await queue.get()]
+            deadline = loop.time() + self.WRITE_BATCH_DELAY
+            while len(batch) < self.WRITE_BATCH_SIZE:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            try:
+                await self._apply_writes(batch)
+            finally:
+                for _ in batch:
+                    queue.task_done()
+
+    async def _apply_writes(self, batch: list[_PendingWrite]) -> None:
+        # Translate row references into either a committed id or the index of the
+        # INSERT earlier in this batch that will produce it.
+        positions: dict[int, int] = {}
+        statements: list[tuple[str, tuple[Any, ...], Optional[int]]] = []
+        pending: list[_PendingWrite] = []
+        for write in batch:
+            params, ref = write.params, None
+            if isinstance(write.row, asyncio.Future):
+                if not write.row.done() and id(write.row) not in positions:
+                    # The row comes from outside the queue (e.g. a bulk bootstrap
+                    # insert that is still running); wait for it to settle.
+                    await asyncio.wait((write.row,))
+                if write.row.done():
+                    if write.row.cancelled() or write.row.exception() is not None:
+                        if not write.future.done():
+                            write.future.set_exception(RuntimeError("referenced INSERT failed"))
+                        continue
+                    params = (*params, write.row.result())
+                else:
+                    ref = positions[id(write.row)]
+            elif write.row is not None:
+                params = (*params, write.row)
+            positions[id(write.future)] = len(statements)
+            statements.append((write.sql, params, ref))
+            pending.append(write)
+
+        try:
+            results = await self._run(self._apply_writes_sync, statements)
+        except Exception as exc:
+            log.exception("Failed to commit %d queued presence writes", len(pending))
+            for write in pending:
+                if not write.future.done():
+                    write.future.set_exception(exc)
+            return
+        for write, result in zip(pending, results):
+            if not write.future.done():
+                write.future.set_result(result)
+
+    def _apply_writes_sync(
+        self, statements: list[tuple[str, tuple[Any, ...], Optional[int]]]
+    ) -> list[Optional[int]]:
+        results: list[Optional[int]] = []
+        with self._transaction() as conn:
+            for sql, params, ref in statements:
+                if ref is not None:
+                    params = (*params, results[ref])
+                cursor = conn.execute(sql, params)
+                row_id = int(cursor.lastrowid) if sql is _INSERT_SESSION_SQL else None
+                results.append(row_id)
+        return results
 
     async def fetch_sessions(
         self,
         guild_id: int,
         user_id: int,
-        statuses: tuple[str, ...],
+        statuses: tuple[PresenceStatus, ...],
     ) -> list[PresenceSession]:
-        return await asyncio.to_thread(self._fetch_sessions_sync, guild_id, user_id, statuses)
+        await self.flush()
+        return await self._run(self._fetch_sessions_sync, guild_id, user_id, statuses)
 
     def _fetch_sessions_sync(
         self,
         guild_id: int,
         user_id: int,
-        statuses: tuple[str, ...],
+        statuses: tuple[PresenceStatus, ...],
     ) -> list[PresenceSession]:
-        placeholders = ",".join("?" for _ in statuses)
-        query = f"""
-            SELECT id, guild_id, user_id, status, started_at, ended_at
-            FROM presence_sessions
-            WHERE guild_id = ? AND user_id = ? AND status IN ({placeholders})
-            ORDER BY started_at ASC
-        """
-        with self._connect() as conn:
-            cursor = conn.execute(query, (guild_id, user_id, *statuses))
-            rows = cursor.fetchall()
+        query = _FETCH_SESSIONS_SQL.get(len(statuses)) or _fetch_sessions_sql(len(statuses))
+        cursor = self._connection().execute(query, (guild_id, user_id, *statuses))
 
+        # Rows are plain tuples in SELECT column order.
         sessions: list[PresenceSession] = []
-        for row in rows:
-            started_at = datetime.fromisoformat(row["started_at"])
-            ended_at = datetime.fromisoformat(row["ended_at"]) if row["ended_at"] else None
+        for row in cursor:
             sessions.append(
                 PresenceSession(
-                    row_id=int(row["id"]),
-                    guild_id=int(row["guild_id"]),
-                    user_id=int(row["user_id"]),
-                    status=str(row["status"]),
-                    started_at=started_at,
-                    ended_at=ended_at,
+                    row_id=row[0],
+                    guild_id=row[1],
+                    user_id=row[2],
+                    status=PresenceStatus(row[3]),
+                    started_at=row[4],
+                    ended_at=row[5],
                 )
             )
-        return sessions
\ No newline at end of file
+        return sessions
+
+    async def total_duration_seconds(
+        self,
+        guild_id: int,
+        user_id: int,
+        statuses: tuple[PresenceStatus, ...],
+        now_unix: int,
+    ) -> int:
+        """Sum session lengths in SQL; open sessions are counted up to ``now_unix``."""
+
+        await self.flush()
+        return await self._run(
+            self._total_duration_seconds_sync, guild_id, user_id, statuses, now_unix
+        )
+
+    def _total_duration_seconds_sync(
+        self,
+        guild_id: int,
+        user_id: int,
+        statuses: tuple[PresenceStatus, ...],
+        now_unix: int,
+    ) -> int:
+        query = _TOTAL_DURATION_SQL.get(len(statuses)) or _total_duration_sql(len(statuses))
+        (total,) = self._connection().execute(
+            query, (now_unix, guild_id, user_id, *statuses)
+        ).fetchone()
+        return int(total)
+
+
+class Database:
+    """SQLite-backed storage with asyncio-friendly helpers.
+
+    Sessions are spread over ``shard_count`` files by ``guild_id % shard_count``
+    so each guild bucket gets its own write lock, writer thread and indexes.
+    With a single shard the data lives in ``database_path`` itself; otherwise
+    shard ``n`` is stored next to it as ``<stem>_guild_<n><suffix>``.
+    Changing ``shard_count`` re-buckets guilds, so existing data is not moved.
+    """
+
+    CHECKPOINT_INTERVAL = 3600.0
+
+    def __init__(self, database_path: Path, shard_count: int = 1) -> None:
+        if shard_count < 1:
+            raise ValueError("shard_count must be at least 1")
+        database_path = Path(database_path)
+        if shard_count == 1:
+            paths = [database_path]
+        else:
+            paths = [
+                database_path.with_name(f"{database_path.stem}_guild_{index}{database_path.suffix}")
+                for index in range(shard_count)
+            ]
+        self._shards = [_Shard(path) for path in paths]
+        self._maintenance: Optional[asyncio.Task[None]] = None
+
+    def _shard(self, guild_id: int) -> _Shard:
+        return self._shards[guild_id % len(self._shards)]
+
+    async def initialize(self) -> None:
+        await asyncio.gather(*(shard.initialize() for shard in self._shards))
+        if self._maintenance is None or self._maintenance.done():
+            self._maintenance = asyncio.get_running_loop().create_task(self._checkpoint_loop())
+
+    async def close(self) -> None:
+        """Flush queued writes and close every shard; they are reopened on next use."""
+
+        if self._maintenance is not None:
+            self._maintenance.cancel()
+            try:
+                await self._maintenance
+            except asyncio.CancelledError:
+                pass
+            self._maintenance = None
+        await asyncio.gather(*(shard.close() for shard in self._shards))
+
+    async def checkpoint(self) -> None:
+        """Truncate every shard's WAL so it does not grow without bound."""
+
+        await asyncio.gather(*(shard.checkpoint() for shard in self._shards))
+
+    async def _checkpoint_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.CHECKPOINT_INTERVAL)
+            try:
+                await self.checkpoint()
+            except sqlite3.Error:
+                log.exception("Periodic WAL checkpoint failed")
+
+    async def flush(self) -> None:
+        """Wait until every queued write has been committed (or has failed)."""
+
+        await asyncio.gather(*(shard.flush() for shard in self._shards))
+
+    async def close_open_sessions(self, closed_at: datetime) -> None:
+        await asyncio.gather(*(shard.close_open_sessions(closed_at) for shard in self._shards))
+
+    def submit_insert(
+        self,
+        guild_id: int,
+        user_id: int,
+        status: PresenceStatus,
+        started_at: datetime,
+    ) -> asyncio.Future[int]:
+        """Queue a session INSERT; the future resolves to the row id once committed."""
+
+        return self._shard(guild_id).submit_insert(guild_id, user_id, status, started_at)
+
+    def submit_complete(
+        self, guild_id: int, row: RowRef, ended_at: datetime
+    ) -> asyncio.Future[None]:
+        """Queue closing a session, by row id or by the future of a queued INSERT.
+
+        Row ids are only unique within a shard, hence the ``guild_id``.
+        """
+
+        return self._shard(guild_id).submit_complete(row, ended_at)
+
+    def submit_reopen(self, guild_id: int, row: RowRef) -> asyncio.Future[None]:
+        """Queue reopening a closed session so it absorbs a brief status flap."""
+
+        return self._shard(guild_id).submit_reopen(row)
+
+    def submit_delete(self, guild_id: int, row: RowRef) -> asyncio.Future[None]:
+        """Queue removing a session row that a status flap made redundant."""
+
+        return self._shard(guild_id).submit_delete(row)
+
+    async def insert_session(
+        self,
+        guild_id: int,
+        user_id: int,
+        status: PresenceStatus,
+        started_at: datetime,
+    ) -> int:
+        return await self.submit_insert(guild_id, user_id, status, started_at)
+
+    async def complete_session(self, guild_id: int, row_id: RowRef, ended_at: datetime) -> None:
+        await self.submit_complete(guild_id, row_id, ended_at)
+
+    async def reopen_session(self, guild_id: int, row_id: RowRef) -> None:
+        await self.submit_reopen(guild_id, row_id)
+
+    async def insert_sessions_bulk(
+        self, rows: list[tuple[int, int, PresenceStatus, datetime]]
+    ) -> list[int]:
+        """Insert ``(guild_id, user_id, status, started_at)`` rows, one transaction per shard.
+
+        The returned row ids are in the same order as ``rows``.
+        """
+
+        groups: dict[int, list[int]] = {}
+        for index, row in enumerate(rows):
+            groups.setdefault(row[0] % len(self._shards), []).append(index)
+        results = await asyncio.gather(
+            *(
+                self._shards[shard_index].insert_sessions_bulk([rows[index] for index in indexes])
+                for shard_index, indexes in groups.items()
+            )
+        )
+        row_ids = [0] * len(rows)
+        for indexes, inserted in zip(groups.values(), results):
+            for index, row_id in zip(indexes, inserted):
+                row_ids[index] = row_id
+        return row_ids
+
+    async def fetch_sessions(
+        self,
+        guild_id: int,
+        user_id: int,
+        statuses: tuple[PresenceStatus, ...],
+    ) -> list[PresenceSession]:
+        return await self._shard(guild_id).fetch_sessions(guild_id, user_id, statuses)
+
+    async def total_duration_seconds(
+        self,
+        guild_id: int,
+        user_id: int,
+        statuses: tuple[PresenceStatus, ...],
+        now_unix: int,
+    ) -> int:
+        """Sum session lengths in SQL; open sessions are counted up to ``now_unix``."""
+
+        return await self._shard(guild_id).total_duration_seconds(
+            guild_id, user_id, statuses, now_unix
+        )
@@ -1,19 +1,28 @@
 from __future__ import annotations
 
 import asyncio
+import gc
+import sqlite3
 import sys
 from datetime import UTC, datetime, timedelta
+from enum import Enum
 from pathlib import Path
 
 sys.path.append(str(Path(__file__).resolve().parents[1]))
 
-from discord_online_tracker.database import Database
+from discord_online_tracker.database import (
+    _CLOSE_OPEN_SESSIONS_SQL,
+    _TOTAL_DURATION_SQL,
+    Database,
+    PresenceStatus,
+)
 from discord_online_tracker.tracker import PresenceTracker
 
 
 def test_presence_cycle(tmp_path) -> None:
     db_path = tmp_path / "tracker.sqlite"
-    tracker = PresenceTracker(Database(db_path))
+    database = Database(db_path)
+    tracker = PresenceTracker(database)
 
     async def scenario() -> timedelta:
         await tracker.setup()
@@ -27,7 +36,9 @@ def test_presence_cycle(tmp_path) -> None:
         await tracker.handle_presence_update(1, 42, "online", "idle", timestamp=mid)
         await tracker.handle_presence_update(1, 42, "idle", "offline", timestamp=end)
 
-        return await tracker.get_total_duration(1, 42)
+        total = await tracker.get_total_duration(1, 42)
+        await database.close()
+        return total
 
     total = asyncio.run(scenario())
     assert total == timedelta(hours=3)
@@ -35,7 +46,8 @@ def test_presence_cycle(tmp_path) -> None:
 
 def test_ignore_untracked_status(tmp_path) -> None:
     db_path = tmp_path / "tracker.sqlite"
-    tracker = PresenceTracker(Database(db_path))
+    database = Database(db_path)
+    tracker = PresenceTracker(database)
 
     async def scenario() -> timedelta:
         await tracker.setup()
@@ -43,12 +55,14 @@ def test_ignore_untracked_status(tmp_path) -> None:
         end = start + timedelta(minutes=30)
 
         await tracker.handle_presence_update(1, 99, "offline", "streaming", timestamp=start)
-        assert tracker.active_sessions == {}
+        assert len(tracker.active_sessions) == 0
 
         await tracker.handle_presence_update(1, 99, "streaming", "online", timestamp=start)
         await tracker.handle_presence_update(1, 99, "online", "offline", timestamp=end)
 
-        return await tracker.get_total_duration(1, 99)
+        total = await tracker.get_total_duration(1, 99)
+        await database.close()
+        return total
 
     total = asyncio.run(scenario())
     assert total == timedelta(minutes=30)
@@ -58,4 +72,455 @@ def test_formatting() -> None:
     db = Database("/tmp/example.sqlite")
     tracker = PresenceTracker(db)
     formatted = tracker.format_timedelta(timedelta(hours=2, minutes=5, seconds=9))
-    assert formatted == "2h 5m 9s"
\ No newline at end of file
+    assert formatted == "2h 5m 9s"
+    assert tracker.format_timedelta(timedelta(hours=1, seconds=3)) == "1h 3s"
+    assert tracker.format_timedelta(timedelta(minutes=4)) == "4m"
+    assert tracker.format_timedelta(timedelta()) == "0s"
+
+
+def test_failed_transaction_is_rolled_back(tmp_path) -> None:
+    database = Database(tmp_path / "tracker.sqlite")
+    shard = database._shard(1)
+    start = datetime(2024, 1, 3, 12, 0, tzinfo=UTC)
+
+    def failing_transaction() -> bool:
+        try:
+            with shard._transaction() as conn:
+                conn.execute(
+                    "INSERT INTO presence_sessions (guild_id, user_id, status, started_at) VALUES (1, 7, 1, ?)",
+                    (int(start.timestamp()),),
+                )
+                conn.execute("INSERT INTO missing_table VALUES (1)")
+        except sqlite3.OperationalError:
+            pass
+        return shard._connection().in_transaction
+
+    async def scenario() -> list:
+        await database.initialize()
+        assert not await shard._run(failing_transaction)
+
+        await database.insert_session(1, 7, PresenceStatus.IDLE, start)
+        sessions = await database.fetch_sessions(1, 7, (PresenceStatus.ONLINE, PresenceStatus.IDLE))
+        await database.close()
+        return sessions
+
+    sessions = asyncio.run(scenario())
+    assert [session.status for session in sessions] == [PresenceStatus.IDLE]
+
+
+def test_single_connection_is_reused(tmp_path) -> None:
+    database = Database(tmp_path / "tracker.sqlite")
+    shard = database._shard(1)
+    start = datetime(2024, 1, 4, 12, 0, tzinfo=UTC)
+
+    async def scenario() -> None:
+        await database.initialize()
+        conn = shard._conn
+        assert conn is not None
+
+        row_id = await database.insert_session(1, 8, PresenceStatus.ONLINE, start)
+        await database.complete_session(1, row_id, start + timedelta(minutes=5))
+        await database.fetch_sessions(1, 8, (PresenceStatus.ONLINE,))
+        assert shard._conn is conn
+
+        await database.close()
+        assert shard._conn is None
+
+    asyncio.run(scenario())
+
+
+def test_initialize_enables_wal(tmp_path) -> None:
+    db_path = tmp_path / "tracker.sqlite"
+    database = Database(db_path)
+    shard = database._shard(1)
+
+    async def scenario() -> str:
+        await database.initialize()
+        (mode,) = await shard._run(
+            lambda: shard._connection().execute("PRAGMA journal_mode").fetchone()
+        )
+        await database.insert_session(1, 9, PresenceStatus.ONLINE, datetime(2024, 1, 5, tzinfo=UTC))
+        await database.close()
+        return mode
+
+    assert asyncio.run(scenario()) == "wal"
+    wal_path = db_path.with_name(db_path.name + "-wal")
+    assert not wal_path.exists() or wal_path.stat().st_size == 0
+
+
+def test_bootstrap_members_inserts_tracked_only(tmp_path) -> None:
+    database = Database(tmp_path / "tracker.sqlite")
+    tracker = PresenceTracker(database)
+
+    async def scenario() -> list:
+        await tracker.setup()
+        await tracker.bootstrap_members(1, [(10, "online"), (11, "offline"), (12, "dnd")])
+        # Members that already have an active session are not inserted again.
+        await tracker.bootstrap_members(1, [(10, "online")])
+        sessions = await database.fetch_sessions(1, 10, (PresenceStatus.ONLINE,))
+        sessions += await database.fetch_sessions(1, 12, (PresenceStatus.DND,))
+        await database.close()
+        return sessions
+
+    sessions = asyncio.run(scenario())
+    assert set(tracker.active_sessions) == {(1, 10), (1, 12)}
+    assert [session.row_id for session in sessions] == [
+        tracker.active_sessions[(1, 10)].row_id,
+        tracker.active_sessions[(1, 12)].row_id,
+    ]
+
+
+def test_presence_update_during_bootstrap(tmp_path) -> None:
+    database = Database(tmp_path / "tracker.sqlite")
+    tracker = PresenceTracker(database)
+
+    async def scenario() -> list:
+        await tracker.setup()
+        bootstrap = asyncio.create_task(tracker.bootstrap_members(1, [(5, "online"), (6, "idle")]))
+        await asyncio.sleep(0)
+        # Both updates land while the bulk insert is still being awaited.
+        await tracker.handle_presence_update(1, 5, "online", "dnd")
+        await tracker.handle_presence_update(1, 6, "idle", "offline")
+        await bootstrap
+        sessions = await database.fetch_sessions(
+            1, 5, (PresenceStatus.ONLINE, PresenceStatus.DND)
+        )
+        sessions += await database.fetch_sessions(1, 6, (PresenceStatus.IDLE,))
+        await database.close()
+        return [(session.user_id, session.status, session.ended_at is None) for session in sessions]
+
+    assert asyncio.run(scenario()) == [
+        (5, PresenceStatus.ONLINE, False),
+        (5, PresenceStatus.DND, True),
+        (6, PresenceStatus.IDLE, False),
+    ]
+    assert tracker.active_sessions[(1, 5)].status is PresenceStatus.DND
+    assert (1, 6) not in tracker.active_sessions
+
+
+def test_migrates_iso_timestamps(tmp_path) -> None:
+    db_path = tmp_path / "tracker.sqlite"
+    start = datetime(2024, 1, 6, 12, 0, tzinfo=UTC)
+    with sqlite3.connect(db_path) as conn:
+        conn.execute(
+            """
+            CREATE TABLE presence_sessions (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                guild_id INTEGER NOT NULL,
+                user_id INTEGER NOT NULL,
+                status TEXT NOT NULL,
+                started_at TEXT NOT NULL,
+                ended_at TEXT
+            )
+            """
+        )
+        conn.execute(
+            "INSERT INTO presence_sessions (guild_id, user_id, status, started_at, ended_at) VALUES (?, ?, ?, ?, ?)",
+            (1, 5, "online", start.isoformat(), (start + timedelta(minutes=45)).isoformat()),
+        )
+    conn.close()
+    database = Database(db_path)
+    tracker = PresenceTracker(database)
+
+    async def scenario() -> timedelta:
+        await tracker.setup()
+        total = await tracker.get_total_duration(1, 5)
+        await database.close()
+        return total
+
+    assert asyncio.run(scenario()) == timedelta(minutes=45)
+
+
+def test_active_session_counted_once(tmp_path) -> None:
+    database = Database(tmp_path / "tracker.sqlite")
+    tracker = PresenceTracker(database)
+
+    async def scenario() -> timedelta:
+        await tracker.setup()
+        start = datetime(2024, 1, 1, 12, 0, tzinfo=UTC)
+        await tracker.handle_presence_update(1, 43, "offline", "online", timestamp=start)
+        total = await tracker.get_total_duration(1, 43, now=start + timedelta(minutes=10))
+        await database.close()
+        return total
+
+    assert asyncio.run(scenario()) == timedelta(minutes=10)
+
+
+def test_duration_query_uses_covering_index(tmp_path) -> None:
+    database = Database(tmp_path / "tracker.sqlite")
+    shard = database._shard(1)
+
+    async def scenario() -> str:
+        await database.initialize()
+        plan = await shard._run(
+            lambda: shard._connection()
+            .execute("EXPLAIN QUERY PLAN " + _TOTAL_DURATION_SQL[3], (0, 1, 2, 1, 2, 3))
+            .fetchall()
+        )
+        await database.close()
+        return " ".join(str(row[-1]) for row in plan)
+
+    assert "USING COVERING INDEX idx_presence_sessions_cover" in asyncio.run(scenario())
+
+
+def test_queued_writes_are_batched(tmp_path) -> None:
+    database = Database(tmp_path / "tracker.sqlite")
+    shard = database._shard(1)
+    tracker = PresenceTracker(database)
+    batches: list[int] = []
+
+    async def scenario() -> list[timedelta]:
+        await tracker.setup()
+        apply_writes = shard._apply_writes
+
+        async def recording_apply(batch):
+            batches.append(len(batch))
+            await apply_writes(batch)
+
+        shard._apply_writes = recording_apply
+        start = datetime(2024, 1, 7, 12, 0, tzinfo=UTC)
+        for user_id in range(20, 25):
+            await tracker.handle_presence_update(1, user_id, "offline", "online", timestamp=start)
+        # Closing a session whose INSERT is still queued resolves within the same batch.
+        await tracker.handle_presence_update(
+            1, 20, "online", "offline", timestamp=start + timedelta(minutes=3)
+        )
+        await database.flush()
+        assert all(session.row_id is not None for session in tracker.active_sessions.values())
+        end = start + timedelta(minutes=5)
+        totals = [await tracker.get_total_duration(1, user_id, now=end) for user_id in (20, 21)]
+        await database.close()
+        return totals
+
+    assert asyncio.run(scenario()) == [timedelta(minutes=3), timedelta(minutes=5)]
+    assert batches == [6]
+
+
+def test_failed_insert_drops_session(tmp_path) -> None:
+    database = Database(tmp_path / "tracker.sqlite")
+    tracker = PresenceTracker(database)
+    shard = database._shard(1)
+    unhandled: list[dict] = []
+
+    async def scenario() -> list:
+        asyncio.get_running_loop().set_exception_handler(lambda loop, context: unhandled.append(context))
+        await tracker.setup()
+        apply_writes_sync = shard._apply_writes_sync
+
+        def failing_apply(statements):
+            shard._apply_writes_sync = apply_writes_sync
+            raise sqlite3.OperationalError("disk I/O error")
+
+        shard._apply_writes_sync = failing_apply
+        start = datetime(2024, 1, 14, 12, 0, tzinfo=UTC)
+        await tracker.handle_presence_update(1, 51, "offline", "online", timestamp=start)
+        await database.flush()
+        assert (1, 51) not in tracker.active_sessions
+
+        await tracker.handle_presence_update(1, 51, "offline", "online", timestamp=start + timedelta(minutes=1))
+        await tracker.handle_presence_update(1, 51, "online", "offline", timestamp=start + timedelta(minutes=2))
+        sessions = await database.fetch_sessions(1, 51, (PresenceStatus.ONLINE,))
+
+        # A caller cancelling its future must not take the writer down with it.
+        failed: asyncio.Future[int] = asyncio.get_running_loop().create_future()
+        failed.set_exception(RuntimeError("insert failed"))
+        failed.exception()
+        database.submit_complete(1, failed, start).cancel()
+        await database.flush()
+        assert shard._writer is not None and not shard._writer.done()
+        await database.close()
+        gc.collect()
+        return sessions
+
+    sessions = asyncio.run(scenario())
+    assert [(session.ended_at - session.started_at) for session in sessions] == [60]
+    assert unhandled == []
+
+
+def test_normalize_status_codes() -> None:
+    tracker = PresenceTracker(Database("/tmp/example.sqlite"))
+    assert tracker._normalize_status("Online") is PresenceStatus.ONLINE
+    assert tracker._normalize_status(PresenceStatus.DND) is PresenceStatus.DND
+    assert tracker._normalize_status(None) is PresenceStatus.OTHER
+    assert tracker._normalize_status("streaming") is PresenceStatus.OTHER
+    assert tracker._normalize_status(["online"]) is PresenceStatus.OTHER
+
+    class Status(Enum):
+        online = "online"
+        invisible = "invisible"
+
+    assert tracker._normalize_status(Status.online) is PresenceStatus.ONLINE
+    assert tracker._normalize_status(Status.invisible) is PresenceStatus.OTHER
+
+
+def test_sharded_database_routes_by_guild(tmp_path) -> None:
+    database = Database(tmp_path / "tracker.sqlite", shard_count=2)
+    tracker = PresenceTracker(database)
+    start = datetime(2024, 1, 8, 12, 0, tzinfo=UTC)
+
+    async def scenario() -> list[timedelta]:
+        await tracker.setup()
+        row_ids = await database.insert_sessions_bulk(
+            [(1, 30, PresenceStatus.ONLINE, start), (2, 30, PresenceStatus.ONLINE, start)]
+        )
+        # Each shard numbers its own rows.
+        assert row_ids == [1, 1]
+        await tracker.handle_presence_update(3, 31, "offline", "idle", timestamp=start)
+        end = start + timedelta(minutes=2)
+        totals = [
+            await tracker.get_total_duration(guild_id, user_id, now=end)
+            for guild_id, user_id in ((1, 30), (2, 30), (3, 31), (4, 31))
+        ]
+        await database.close()
+        return totals
+
+    minutes = timedelta(minutes=2)
+    assert asyncio.run(scenario()) == [minutes, minutes, minutes, timedelta()]
+    assert (tmp_path / "tracker_guild_0.sqlite").exists()
+    assert (tmp_path / "tracker_guild_1.sqlite").exists()
+    assert not (tmp_path / "tracker.sqlite").exists()
+
+
+def test_close_open_sessions_uses_partial_index(tmp_path) -> None:
+    database = Database(tmp_path / "tracker.sqlite")
+    shard = database._shard(1)
+
+    async def scenario() -> str:
+        await database.initialize()
+        plan = await shard._run(
+            lambda: shard._connection()
+            .execute("EXPLAIN QUERY PLAN " + _CLOSE_OPEN_SESSIONS_SQL, (0,))
+            .fetchall()
+        )
+        await database.close()
+        return " ".join(str(row[-1]) for row in plan)
+
+    assert "idx_presence_sessions_open_partial" in asyncio.run(scenario())
+
+
+def test_status_flap_reopens_previous_session(tmp_path) -> None:
+    database = Database(tmp_path / "tracker.sqlite")
+    tracker = PresenceTracker(database)
+
+    async def scenario() -> tuple[timedelta, int]:
+        await tracker.setup()
+        start = datetime(2024, 1, 9, 12, 0, tzinfo=UTC)
+        await tracker.handle_presence_update(1, 44, "offline", "online", timestamp=start)
+        await tracker.handle_presence_update(1, 44, "online", "offline", timestamp=start + timedelta(minutes=1))
+        await tracker.handle_presence_update(
+            1, 44, "offline", "online", timestamp=start + timedelta(minutes=1, seconds=5)
+        )
+        await tracker.handle_presence_update(1, 44, "online", "offline", timestamp=start + timedelta(minutes=2))
+        # Outside the debounce window a new session is started.
+        await tracker.handle_presence_update(1, 44, "offline", "online", timestamp=start + timedelta(minutes=3))
+        await tracker.handle_presence_update(1, 44, "online", "offline", timestamp=start + timedelta(minutes=4))
+        total = await tracker.get_total_duration(1, 44)
+        sessions = await database.fetch_sessions(1, 44, (PresenceStatus.ONLINE,))
+        await database.close()
+        return total, len(sessions)
+
+    assert asyncio.run(scenario()) == (timedelta(minutes=3), 2)
+
+
+def test_tracked_status_blip_is_merged(tmp_path) -> None:
+    database = Database(tmp_path / "tracker.sqlite")
+    tracker = PresenceTracker(database)
+
+    async def scenario() -> list:
+        await tracker.setup()
+        start = datetime(2024, 1, 9, 13, 0, tzinfo=UTC)
+        blip = start + timedelta(minutes=1)
+        await tracker.handle_presence_update(1, 52, "offline", "online", timestamp=start)
+        await tracker.handle_presence_update(1, 52, "online", "idle", timestamp=blip)
+        await tracker.handle_presence_update(1, 52, "idle", "online", timestamp=blip + timedelta(seconds=5))
+        await tracker.handle_presence_update(1, 52, "online", "offline", timestamp=start + timedelta(minutes=2))
+        # A tracked status held longer than the window is kept as its own session.
+        later = start + timedelta(minutes=10)
+        await tracker.handle_presence_update(1, 52, "offline", "online", timestamp=later)
+        await tracker.handle_presence_update(1, 52, "online", "idle", timestamp=later + timedelta(minutes=1))
+        await tracker.handle_presence_update(1, 52, "idle", "online", timestamp=later + timedelta(minutes=2))
+        await tracker.handle_presence_update(1, 52, "online", "offline", timestamp=later + timedelta(minutes=3))
+        sessions = await database.fetch_sessions(
+            1, 52, (PresenceStatus.ONLINE, PresenceStatus.IDLE)
+        )
+        await database.close()
+        return [(session.status, session.ended_at - session.started_at) for session in sessions]
+
+    assert asyncio.run(scenario()) == [
+        (PresenceStatus.ONLINE, 120),
+        (PresenceStatus.ONLINE, 60),
+        (PresenceStatus.IDLE, 60),
+        (PresenceStatus.ONLINE, 60),
+    ]
+
+
+def test_total_duration_is_cached_until_next_write(tmp_path) -> None:
+    database = Database(tmp_path / "tracker.sqlite")
+    tracker = PresenceTracker(database)
+    queries: list[int] = []
+
+    async def scenario() -> None:
+        await tracker.setup()
+        total_duration_seconds = database.total_duration_seconds
+
+        async def counting_total(*args):
+            queries.append(args[1])
+            return await total_duration_seconds(*args)
+
+        database.total_duration_seconds = counting_total
+        start = datetime(2024, 1, 10, 12, 0, tzinfo=UTC)
+        await tracker.get_total_duration(1, 45)
+        await tracker.get_total_duration(1, 45)
+        assert len(queries) == 1
+
+        await tracker.handle_presence_update(1, 45, "offline", "online", timestamp=start)
+        await tracker.get_total_duration(1, 45)
+        assert len(queries) == 2
+        await database.close()
+
+    asyncio.run(scenario())
+
+
+def test_unchanged_status_is_a_no_op(tmp_path) -> None:
+    database = Database(tmp_path / "tracker.sqlite")
+    tracker = PresenceTracker(database)
+
+    async def scenario() -> None:
+        await tracker.setup()
+        start = datetime(2024, 1, 11, 12, 0, tzinfo=UTC)
+        await tracker.handle_presence_update(1, 46, "offline", "online", timestamp=start)
+        session = tracker.active_sessions[(1, 46)]
+        await tracker.handle_presence_update(1, 46, "online", "online", timestamp=start + timedelta(minutes=1))
+        assert tracker.active_sessions[(1, 46)] is session
+
+        await tracker.handle_presence_update(1, 47, "offline", "invisible", timestamp=start)
+        assert (1, 47) not in tracker.active_sessions
+        # A tracked member without a session (missed at bootstrap) still gets one.
+        await tracker.handle_presence_update(1, 48, "idle", "idle", timestamp=start)
+        assert tracker.active_sessions[(1, 48)].status is PresenceStatus.IDLE
+        await database.close()
+
+    asyncio.run(scenario())
+
+
+def test_checkpoint_truncates_wal(tmp_path) -> None:
+    db_path = tmp_path / "tracker.sqlite"
+    database = Database(db_path)
+    wal_path = db_path.with_name(db_path.name + "-wal")
+
+    async def scenario() -> None:
+        await database.initialize()
+        maintenance = database._maintenance
+        assert maintenance is not None and not maintenance.done()
+
+        await database.insert_session(1, 49, PresenceStatus.ONLINE, datetime(2024, 1, 12, tzinfo=UTC))
+        assert wal_path.stat().st_size > 0
+        await database.checkpoint()
+        assert wal_path.stat().st_size == 0
+
+        await database.close()
+        assert maintenance.cancelled()
+        assert database._maintenance is None
+
+    asyncio.run(scenario())
+
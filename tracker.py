@@ -2,37 +2,125 @@
 
 from __future__ import annotations
 
+import asyncio
+import logging
+import time
+from collections import OrderedDict
 from dataclasses import dataclass
 from datetime import UTC, datetime, timedelta
-from typing import Dict, Iterable, Optional, Tuple
+from typing import Dict, Iterable, Iterator, Mapping, Optional, Tuple
 
-from .database import Database
+from .database import Database, PresenceStatus, RowRef, to_unix
 
-try:  # pragma: no cover - optional import for typing convenience
-    import discord
-except Exception:  # pragma: no cover
-    discord = None  # type: ignore
+log = logging.getLogger(__name__)
 
-TrackedStatus = Tuple[str, ...]
+TrackedStatus = Tuple[PresenceStatus, ...]
+
+_USER_ID_MASK = (1 << 64) - 1
+
+
+def _key(guild_id: int, user_id: int) -> int:
+    """Pack two 64-bit snowflakes into one int so lookups hash a single int."""
+
+    return (guild_id << 64) | user_id
+
+
+# Precomputed so the per-event lookup is a single hash hit instead of str().lower().
+# Enum members such as discord.Status are added on first sight (see _normalize_status),
+# which avoids importing discord here.
+_STATUS_MAP: Dict[object, PresenceStatus] = {
+    "online": PresenceStatus.ONLINE,
+    "idle": PresenceStatus.IDLE,
+    "dnd": PresenceStatus.DND,
+    **{status: status for status in PresenceStatus},
+}
 
 
 @dataclass(slots=True)
 class ActiveSession:
-    """Represents an in-memory session that has not yet closed."""
+    """Represents an in-memory session that has not yet closed.
+
+    ``row_id`` stays ``None`` until the queued INSERT commits; until then
+    ``pending_row`` holds the future that will produce it.
+    """
 
-    row_id: int
+    row_id: Optional[int]
     started_at: datetime
-    status: str
+    status: PresenceStatus
+    pending_row: Optional[asyncio.Future[int]] = None
+
+    @property
+    def row_ref(self) -> RowRef:
+        """The committed row id, or the future of the INSERT still in flight."""
+
+        if self.row_id is not None:
+            return self.row_id
+        assert self.pending_row is not None
+        return self.pending_row
+
+    def _on_row_committed(self, future: asyncio.Future[int]) -> None:
+        if future.cancelled() or future.exception() is not None:
+            return
+        self.row_id = future.result()
+        self.pending_row = None
+
+
+class _ActiveSessionsView(Mapping[Tuple[int, int], ActiveSession]):
+    """Read-only view of active sessions keyed by ``(guild_id, user_id)``."""
+
+    __slots__ = ("_sessions",)
+
+    def __init__(self, sessions: Dict[int, ActiveSession]) -> None:
+        self._sessions = sessions
+
+    def __getitem__(self, key: Tuple[int, int]) -> ActiveSession:
+        return self._sessions[_key(*key)]
+
+    def __contains__(self, key: object) -> bool:
+        return isinstance(key, tuple) and len(key) == 2 and _key(*key) in self._sessions
+
+    def __iter__(self) -> Iterator[Tuple[int, int]]:
+        for packed in self._sessions:
+            yield packed >> 64, packed & _USER_ID_MASK
+
+    def __len__(self) -> int:
+        return len(self._sessions)
 
 
 class PresenceTracker:
     """Tracks presence transitions and persists them in the database."""
 
-    TRACKED_STATUSES: TrackedStatus = ("online", "idle", "dnd")
+    TRACKED_STATUSES: TrackedStatus = (
+        PresenceStatus.ONLINE,
+        PresenceStatus.IDLE,
+        PresenceStatus.DND,
+    )
+
+    # Status flaps shorter than this are merged instead of recorded as new rows:
+    # returning to the status of a session closed this recently reopens it, and
+    # a short blip through another tracked status (online -> idle -> online, as
+    # mobile clients do) is dropped in favour of the session it interrupted.
+    DEBOUNCE_WINDOW = timedelta(seconds=15)
+    _RECENTLY_CLOSED_LIMIT = 10_000
+    # Repeated !online lookups within this many seconds reuse the previous total.
+    DURATION_CACHE_TTL = 5.0
+    _DURATION_CACHE_SIZE = 1024
 
     def __init__(self, database: Database) -> None:
         self._database = database
-        self._active_sessions: Dict[tuple[int, int], ActiveSession] = {}
+        # All per-member maps are keyed by _key(guild_id, user_id).
+        self._active_sessions: Dict[int, ActiveSession] = {}
+        # Last closed session per member, with the session it directly followed (if
+        # that one closed within DEBOUNCE_WINDOW of the start), for flap merging.
+        self._recently_closed: Dict[
+            int, tuple[ActiveSession, datetime, Optional[tuple[ActiveSession, datetime]]]
+        ] = {}
+        # Same "directly followed" link for sessions that are still active.
+        self._predecessors: Dict[int, tuple[ActiveSession, datetime]] = {}
+        # member key -> statuses -> (monotonic timestamp, total), least recently used first.
+        self._duration_cache: OrderedDict[
+            int, Dict[TrackedStatus, tuple[float, timedelta]]
+        ] = OrderedDict()
 
     async def setup(self) -> None:
         """Ensure the database schema exists and clean up stale sessions."""
@@ -44,20 +132,51 @@ class PresenceTracker:
     async def bootstrap_member(self, guild_id: int, user_id: int, status: object) -> None:
         """Start an active session for members currently online when the bot boots."""
 
-        normalized = self._normalize_status(status)
-        if not self._is_tracked(normalized):
-            return
-        key = (guild_id, user_id)
-        if key in self._active_sessions:
-            return
+        await self.bootstrap_members(guild_id, [(user_id, status)])
+
+    async def bootstrap_members(
+        self, guild_id: int, members: Iterable[tuple[int, object]]
+    ) -> None:
+        """Start active sessions for ``(user_id, status)`` pairs in a single write."""
+
+        # Sessions are registered before the insert is awaited so presence updates
+        # arriving meanwhile see (and close) them; their row ids resolve afterwards.
+        loop = asyncio.get_running_loop()
         started_at = datetime.now(tz=UTC)
-        row_id = await self._database.insert_session(
-            guild_id=guild_id,
-            user_id=user_id,
-            status=normalized,
-            started_at=started_at,
-        )
-        self._active_sessions[key] = ActiveSession(row_id=row_id, started_at=started_at, status=normalized)
+        reserved: list[tuple[int, ActiveSession]] = []
+        for user_id, status in members:
+            normalized = self._normalize_status(status)
+            if not self._is_tracked(normalized):
+                continue
+            key = _key(guild_id, user_id)
+            if key in self._active_sessions:
+                continue
+            pending: asyncio.Future[int] = loop.create_future()
+            session = ActiveSession(
+                row_id=None, started_at=started_at, status=normalized, pending_row=pending
+            )
+            self._watch_insert(key, session, pending)
+            self._active_sessions[key] = session
+            self._duration_cache.pop(key, None)
+            reserved.append((user_id, session))
+        if not reserved:
+            return
+        try:
+            row_ids = await self._database.insert_sessions_bulk(
+                [(guild_id, user_id, session.status, started_at) for user_id, session in reserved]
+            )
+        except BaseException:
+            for user_id, session in reserved:
+                key = _key(guild_id, user_id)
+                if self._active_sessions.get(key) is session:
+                    del self._active_sessions[key]
+                assert session.pending_row is not None
+                # Writes queued against these rows fail instead of waiting forever.
+                session.pending_row.cancel()
+            raise
+        for (_, session), row_id in zip(reserved, row_ids):
+            assert session.pending_row is not None
+            session.pending_row.set_result(row_id)
 
     async def handle_presence_update(
         self,
@@ -69,36 +188,126 @@ class PresenceTracker:
     ) -> None:
         """Record status changes for the provided member."""
 
-        timestamp = timestamp or datetime.now(tz=UTC)
         before = self._normalize_status(before_status)
         after = self._normalize_status(after_status)
-        key = (guild_id, user_id)
+        key = _key(guild_id, user_id)
+        if before == after:
+            # Most updates are activity/profile changes. Nothing to record unless a
+            # tracked member somehow has no session yet (e.g. missed at bootstrap).
+            if after is PresenceStatus.OTHER or key in self._active_sessions:
+                return
+
+        timestamp = timestamp or datetime.now(tz=UTC)
         active = self._active_sessions.get(key)
 
         before_tracked = self._is_tracked(before)
         after_tracked = self._is_tracked(after)
 
         if before_tracked and active and (not after_tracked or after != active.status):
-            await self._close_session(key, timestamp)
+            await self._close_session(guild_id, key, timestamp)
             active = None
 
         if after_tracked:
             if active is None:
-                row_id = await self._database.insert_session(guild_id, user_id, after, timestamp)
-                self._active_sessions[key] = ActiveSession(row_id=row_id, started_at=timestamp, status=after)
+                self._start_session(guild_id, user_id, after, timestamp)
             elif active.status != after:
                 # we have already closed the previous session, start a new one
-                row_id = await self._database.insert_session(guild_id, user_id, after, timestamp)
-                self._active_sessions[key] = ActiveSession(row_id=row_id, started_at=timestamp, status=after)
+                self._start_session(guild_id, user_id, after, timestamp)
         elif active and not after_tracked:
             # Ensure no lingering sessions for non-tracked statuses
-            await self._close_session(key, timestamp)
+            await self._close_session(guild_id, key, timestamp)
+
+    def _start_session(
+        self, guild_id: int, user_id: int, status: PresenceStatus, started_at: datetime
+    ) -> None:
+        # The write is queued rather than awaited so bursts of presence updates
+        # are committed together by the database's background writer.
+        key = _key(guild_id, user_id)
+        self._duration_cache.pop(key, None)
+        closed = self._recently_closed.pop(key, None)
+        if closed is not None:
+            previous, ended_at, earlier = closed
+            if started_at - ended_at < self.DEBOUNCE_WINDOW:
+                if previous.status == status:
+                    self._resume_session(guild_id, key, previous, earlier)
+                    return
+                if (
+                    earlier is not None
+                    and earlier[0].status == status
+                    and started_at - earlier[1] < self.DEBOUNCE_WINDOW
+                ):
+                    # ``previous`` was a short blip between two sessions of this status.
+                    self._database.submit_delete(guild_id, previous.row_ref).add_done_callback(
+                        self._log_write_failure
+                    )
+                    self._resume_session(guild_id, key, earlier[0], None)
+                    return
+                self._predecessors[key] = (previous, ended_at)
+        pending = self._database.submit_insert(guild_id, user_id, status, started_at)
+        session = ActiveSession(row_id=None, started_at=started_at, status=status, pending_row=pending)
+        self._watch_insert(key, session, pending)
+        self._active_sessions[key] = session
+
+    def _resume_session(
+        self,
+        guild_id: int,
+        key: int,
+        session: ActiveSession,
+        predecessor: Optional[tuple[ActiveSession, datetime]],
+    ) -> None:
+        self._database.submit_reopen(guild_id, session.row_ref).add_done_callback(
+            self._log_write_failure
+        )
+        self._active_sessions[key] = session
+        if predecessor is not None:
+            self._predecessors[key] = predecessor
 
-    async def _close_session(self, key: tuple[int, int], ended_at: datetime) -> None:
+    async def _close_session(self, guild_id: int, key: int, ended_at: datetime) -> None:
         session = self._active_sessions.pop(key, None)
         if session is None:
             return
-        await self._database.complete_session(session.row_id, ended_at)
+        self._duration_cache.pop(key, None)
+        self._database.submit_complete(guild_id, session.row_ref, ended_at).add_done_callback(
+            self._log_write_failure
+        )
+        if len(self._recently_closed) >= self._RECENTLY_CLOSED_LIMIT:
+            self._prune_recently_closed(ended_at)
+        self._recently_closed[key] = (session, ended_at, self._predecessors.pop(key, None))
+
+    def _watch_insert(self, key: int, session: ActiveSession, pending: asyncio.Future[int]) -> None:
+        def on_done(future: asyncio.Future[int]) -> None:
+            if future.cancelled() or future.exception() is None:
+                session._on_row_committed(future)
+                return
+            log.warning("Failed to record presence session", exc_info=future.exception())
+            # Forget the session so the member's next update starts a fresh row
+            # instead of closing one that was never written.
+            if self._active_sessions.get(key) is session:
+                del self._active_sessions[key]
+            closed = self._recently_closed.get(key)
+            if closed is not None and closed[0] is session:
+                del self._recently_closed[key]
+            elif closed is not None and closed[2] is not None and closed[2][0] is session:
+                self._recently_closed[key] = (closed[0], closed[1], None)
+            predecessor = self._predecessors.get(key)
+            if predecessor is not None and predecessor[0] is session:
+                del self._predecessors[key]
+
+        pending.add_done_callback(on_done)
+
+    @staticmethod
+    def _log_write_failure(future: asyncio.Future[None]) -> None:
+        if future.cancelled():
+            return
+        exc = future.exception()
+        if exc is not None:
+            log.warning("Failed to update presence session", exc_info=exc)
+
+    def _prune_recently_closed(self, now: datetime) -> None:
+        cutoff = now - self.DEBOUNCE_WINDOW
+        for key, (_, ended_at, _) in list(self._recently_closed.items()):
+            if ended_at <= cutoff:
+                del self._recently_closed[key]
 
     async def get_total_duration(
         self,
@@ -107,42 +316,72 @@ class PresenceTracker:
         statuses: Optional[Iterable[str]] = None,
         now: Optional[datetime] = None,
     ) -> timedelta:
-        """Compute total duration across stored sessions."""
+        """Compute total duration across stored sessions.
+
+        Without an explicit ``now`` the result may be served from a cache that is
+        at most ``DURATION_CACHE_TTL`` seconds old.
+        """
 
-        now = now or datetime.now(tz=UTC)
         statuses_tuple = self._normalize_statuses(statuses)
-        sessions = await self._database.fetch_sessions(guild_id, user_id, statuses_tuple)
-        total = timedelta()
-        for session in sessions:
-            end = session.ended_at or now
-            total += end - session.started_at
-        key = (guild_id, user_id)
-        active = self._active_sessions.get(key)
-        if active and active.status in statuses_tuple:
-            total += now - active.started_at
+        if now is not None:
+            return await self._query_total_duration(guild_id, user_id, statuses_tuple, now)
+
+        key = _key(guild_id, user_id)
+        checked_at = time.monotonic()
+        cached = self._duration_cache.get(key, {}).get(statuses_tuple)
+        if cached is not None and checked_at - cached[0] < self.DURATION_CACHE_TTL:
+            self._duration_cache.move_to_end(key)
+            return cached[1]
+
+        total = await self._query_total_duration(
+            guild_id, user_id, statuses_tuple, datetime.now(tz=UTC)
+        )
+        self._duration_cache.setdefault(key, {})[statuses_tuple] = (checked_at, total)
+        self._duration_cache.move_to_end(key)
+        if len(self._duration_cache) > self._DURATION_CACHE_SIZE:
+            self._duration_cache.popitem(last=False)
         return total
 
+    async def _query_total_duration(
+        self,
+        guild_id: int,
+        user_id: int,
+        statuses: TrackedStatus,
+        now: datetime,
+    ) -> timedelta:
+        # Active sessions are stored with ended_at NULL, so the query already
+        # counts them up to ``now``.
+        seconds = await self._database.total_duration_seconds(guild_id, user_id, statuses, to_unix(now))
+        return timedelta(seconds=seconds)
+
     def format_timedelta(self, delta: timedelta) -> str:
         """Return a human readable representation of a duration."""
 
-        total_seconds = int(delta.total_seconds())
-        hours, remainder = divmod(total_seconds, 3600)
+        hours, remainder = divmod(int(delta.total_seconds()), 3600)
         minutes, seconds = divmod(remainder, 60)
-        parts = []
+        # Zero units are omitted, except that a zero duration renders as "0s".
         if hours:
-            parts.append(f"{hours}h")
+            if minutes:
+                return f"{hours}h {minutes}m {seconds}s" if seconds else f"{hours}h {minutes}m"
+            return f"{hours}h {seconds}s" if seconds else f"{hours}h"
         if minutes:
-            parts.append(f"{minutes}m")
-        if seconds or not parts:
-            parts.append(f"{seconds}s")
-        return " ".join(parts)
-
-    def _normalize_status(self, status: object) -> str:
-        if status is None:
-            return "offline"
-        if discord and isinstance(status, discord.Status):  # pragma: no cover - requires discord package
-            return status.value
-        return str(status).lower()
+            return f"{minutes}m {seconds}s" if seconds else f"{minutes}m"
+        return f"{seconds}s"
+
+    def _normalize_status(self, status: object) -> PresenceStatus:
+        try:
+            code = _STATUS_MAP.get(status)
+        except TypeError:  # unhashable input; fall back to its string form
+            return _STATUS_MAP.get(str(status).lower(), PresenceStatus.OTHER)
+        if code is not None:
+            return code
+        value = getattr(status, "value", None)
+        if isinstance(value, str):
+            # An enum member (discord.Status) whose value is the lowercase name.
+            code = _STATUS_MAP.get(value, PresenceStatus.OTHER)
+            _STATUS_MAP[status] = code
+            return code
+        return _STATUS_MAP.get(str(status).lower(), PresenceStatus.OTHER)
 
     def _normalize_statuses(self, statuses: Optional[Iterable[str]]) -> TrackedStatus:
         if statuses is None:
@@ -150,11 +389,11 @@ class PresenceTracker:
         normalized = tuple(self._normalize_status(status) for status in statuses)
         return tuple(status for status in normalized if self._is_tracked(status)) or self.TRACKED_STATUSES
 
-    def _is_tracked(self, status: str) -> bool:
-        return status in self.TRACKED_STATUSES
+    def _is_tracked(self, status: PresenceStatus) -> bool:
+        return status != PresenceStatus.OTHER
 
     @property
-    def active_sessions(self) -> Dict[tuple[int, int], ActiveSession]:
-        """Expose active sessions for introspection/testing."""
+    def active_sessions(self) -> Mapping[tuple[int, int], ActiveSession]:
+        """Expose a read-only live view of active sessions for introspection/testing."""
 
-        return dict(self._active_sessions)
\ No newline at end of file
+        return _ActiveSessionsView(self._active_sessions)
\ No newline at end of file